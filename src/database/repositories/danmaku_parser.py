@@ -12,6 +12,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 class DanmakuParamsParser:
     """弹幕参数解析器"""
     
+    __slots__ = ()
+    
     @staticmethod
     def parse_params_string(params: str) -> Dict[str, Any]:
         """
@@ -116,7 +118,7 @@ async def create_comment_params_view(session: AsyncSession, database_type: str =
             CAST(SPLIT_PART(p, ',', 1) AS DECIMAL(10,2)) as param_time,
             CAST(SPLIT_PART(p, ',', 2) AS INTEGER) as mode,
             CAST(SPLIT_PART(p, ',', 3) AS INTEGER) as font_size,
-            CAST(SPLIT_PART(p, ',', 4) AS INTEGER) as color,
+            CAST(SPLIT_PART(p, ',', 4) AS BIGINT) as color,
             CAST(SPLIT_PART(p, ',', 5) AS INTEGER) as timestamp,
             CAST(SPLIT_PART(p, ',', 6) AS INTEGER) as pool,
             SPLIT_PART(p, ',', 7) as danmaku_id,
@@ -175,6 +177,8 @@ async def drop_comment_params_view(session: AsyncSession):
 class EnhancedCommentStatistics:
     """增强的弹幕统计功能"""
     
+    __slots__ = ("session", "parser")
+    
     def __init__(self, session: AsyncSession):
         self.session = session
         self.parser = DanmakuParamsParser()
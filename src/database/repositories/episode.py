@@ -361,19 +361,17 @@ class CommentRepository(BaseRepository[Comment]):
         Returns:
             包含统计数据的字典
         """
-        # 基础统计
-        total_count_stmt = select(func.count(Comment.id)).where(
-            Comment.episode_id == episode_id
-        )
-        total_result = await self.session.execute(total_count_stmt)
-        total_count = total_result.scalar() or 0
-        
-        # 平均时间偏移
-        avg_time_stmt = select(func.avg(Comment.t)).where(
+        # 基础统计：总数与平均时间偏移在同一条聚合查询中完成
+        summary_stmt = select(
+            func.count(Comment.id),
+            func.avg(Comment.t)
+        ).where(
             Comment.episode_id == episode_id
         )
-        avg_result = await self.session.execute(avg_time_stmt)
-        avg_time = avg_result.scalar() or 0
+        summary_result = await self.session.execute(summary_stmt)
+        total_count, avg_time = summary_result.one()
+        total_count = total_count or 0
+        avg_time = avg_time or 0
         
         # 弹幕时间分布（每分钟弹幕数）
         time_distribution_stmt = select(
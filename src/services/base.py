@@ -60,6 +60,8 @@ class PermissionDeniedError(ServiceError):
 class ServiceResult(Generic[ServiceResult]):
     """服务结果封装"""
     
+    __slots__ = ("success", "data", "error", "message", "timestamp")
+    
     def __init__(
         self, 
         success: bool,
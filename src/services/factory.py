@@ -111,7 +111,8 @@ class ServiceFactory:
         health_results = {}
         overall_healthy = True
         
-        # 检查各个服务
+        # 所有服务共享同一个AsyncSession，而AsyncSession不支持并发操作，
+        # 因此这里必须逐个检查，不能使用 asyncio.gather
         services_to_check = [
             ("anime", self.anime),
             ("episode", self.episode), 
@@ -0,0 +1,18 @@
+"""
+测试全局配置
+
+项目以可编辑模式安装（uv sync / pip install -e .）后 `src` 包即可直接导入；
+这里仅在 pytest 启动时确保项目根目录位于 sys.path 中，且只插入一次。
+"""
+
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def pytest_configure(config):
+    """在收集测试之前注册项目根目录"""
+    root = str(PROJECT_ROOT)
+    if root not in sys.path:
+        sys.path.insert(0, root)
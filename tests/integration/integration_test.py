@@ -7,7 +7,7 @@
 import asyncio
 import logging
 import sys
-import json
+import orjson
 from pathlib import Path
 from typing import Dict, Any, Optional
 import httpx
@@ -26,8 +26,11 @@ logger = logging.getLogger(__name__)
 class IntegrationTestRunner:
     """集成测试运行器"""
     
-    def __init__(self):
-        self.test_results = []
+    def __init__(self, details_file: Optional[Path] = None):
+        # 仅保留计数，逐项结果在测试完成时以 ndjson 形式流式写入 details_file
+        self.total_tests = 0
+        self.passed_tests = 0
+        self.details_file = details_file
         self.setup_completed = False
         
     async def setup_test_environment(self):
@@ -58,6 +61,9 @@ class IntegrationTestRunner:
                 config={"test_mode": True}
             )
             
+            # 预先构建各测试复用的模拟结果与AsyncMock，避免在测试体内重复构造
+            self._build_canned_mocks()
+            
             self.setup_completed = True
             logger.info("✅ 测试环境设置完成")
             return True
@@ -66,6 +72,123 @@ class IntegrationTestRunner:
             logger.error(f"❌ 测试环境设置失败: {e}")
             return False
     
+    def _build_canned_mocks(self):
+        """构建只读的模拟服务结果及对应的AsyncMock（仅在环境设置时执行一次）"""
+        from src.services.base import ServiceResult, ResourceNotFoundError, ValidationError
+        
+        mock_user_data = {
+            "user": {
+                "id": 1,
+                "username": "testuser",
+                "created_at": "2024-01-01T00:00:00"
+            }
+        }
+        mock_token_data = {
+            "token": "test.jwt.token",
+            "token_type": "Bearer",
+            "expires_in": 86400,
+            "user": {"id": 1, "username": "testuser"}
+        }
+        mock_search_results = [
+            {
+                "id": 1,
+                "title": "测试番剧1",
+                "type": "TV_SERIES",
+                "season": 1,
+                "year": 2024
+            },
+            {
+                "id": 2, 
+                "title": "测试番剧2",
+                "type": "OVA",
+                "season": 1,
+                "year": 2024
+            }
+        ]
+        mock_anime_detail = {
+            "anime": mock_search_results[0],
+            "sources": [{"id": 1, "provider_name": "test_provider"}],
+            "episodes_count": 12,
+            "danmaku_count": 5000
+        }
+        mock_episodes = {
+            "episodes": [
+                {
+                    "id": 1,
+                    "title": "第1集",
+                    "episode_index": 1,
+                    "danmaku_count": 100
+                },
+                {
+                    "id": 2,
+                    "title": "第2集", 
+                    "episode_index": 2,
+                    "danmaku_count": 150
+                }
+            ],
+            "total_episodes": 2,
+            "source": {"id": 1, "provider_name": "test_provider"}
+        }
+        mock_analysis = {
+            "episode": {"id": 1, "title": "第1集"},
+            "basic_stats": {
+                "total_count": 100,
+                "average_time_offset": 600.5,
+                "time_distribution": {0: 10, 1: 15, 2: 20}
+            },
+            "enhanced_stats": {
+                "color_distribution": {"#FFFFFF": 50, "#FF0000": 30},
+                "mode_distribution": {"从右至左滚动": 80, "底端固定": 20}
+            }
+        }
+        
+        # 认证流程
+        self._create_user_mock = AsyncMock(
+            return_value=ServiceResult.success_result(data=mock_user_data, message="用户创建成功")
+        )
+        self._authenticate_user_mock = AsyncMock(
+            return_value=ServiceResult.success_result(data=mock_user_data, message="认证成功")
+        )
+        self._create_jwt_token_mock = AsyncMock(
+            return_value=ServiceResult.success_result(data=mock_token_data, message="令牌创建成功")
+        )
+        
+        # 番剧管理流程
+        self._search_anime_mock = AsyncMock(
+            return_value=ServiceResult.success_result(data=mock_search_results, message="搜索成功")
+        )
+        self._anime_detail_mock = AsyncMock(
+            return_value=ServiceResult.success_result(data=mock_anime_detail, message="获取详情成功")
+        )
+        
+        # 分集弹幕流程
+        self._episodes_mock = AsyncMock(
+            return_value=ServiceResult.success_result(data=mock_episodes, message="获取分集成功")
+        )
+        self._danmaku_analysis_mock = AsyncMock(
+            return_value=ServiceResult.success_result(data=mock_analysis, message="弹幕分析完成")
+        )
+        
+        # 错误处理
+        self._anime_not_found_mock = AsyncMock(
+            return_value=ServiceResult.error_result(ResourceNotFoundError("Anime", 999))
+        )
+        self._search_validation_error_mock = AsyncMock(
+            return_value=ServiceResult.error_result(ValidationError("搜索关键词不能为空", "query"))
+        )
+        
+        # 服务健康检查
+        self._health_check_mocks = {
+            service_name: AsyncMock(
+                return_value=ServiceResult.success_result({
+                    "service": f"{service_name.title()}Service",
+                    "status": "healthy",
+                    "timestamp": "2024-01-01T00:00:00"
+                })
+            )
+            for service_name in ("anime", "episode", "danmaku", "user", "auth")
+        }
+    
     async def test_application_startup(self):
         """测试应用启动"""
         try:
@@ -128,22 +251,7 @@ class IntegrationTestRunner:
             user_service = self.service_factory.user
             
             # 模拟用户创建成功的结果
-            from src.services.base import ServiceResult
-            
-            mock_user_data = {
-                "user": {
-                    "id": 1,
-                    "username": "testuser",
-                    "created_at": "2024-01-01T00:00:00"
-                }
-            }
-            
-            user_service.create_user = AsyncMock(
-                return_value=ServiceResult.success_result(
-                    data=mock_user_data,
-                    message="用户创建成功"
-                )
-            )
+            user_service.create_user = self._create_user_mock
             
             # 测试用户创建
             create_result = await user_service.create_user("testuser", "testpassword123")
@@ -151,31 +259,14 @@ class IntegrationTestRunner:
             assert create_result.data["user"]["username"] == "testuser"
             
             # 模拟用户认证成功的结果
-            user_service.authenticate_user = AsyncMock(
-                return_value=ServiceResult.success_result(
-                    data=mock_user_data,
-                    message="认证成功"
-                )
-            )
+            user_service.authenticate_user = self._authenticate_user_mock
             
             # 测试用户认证
             auth_result = await user_service.authenticate_user("testuser", "testpassword123")
             assert auth_result.success == True
             
             # 模拟JWT令牌生成
-            mock_token_data = {
-                "token": "test.jwt.token",
-                "token_type": "Bearer",
-                "expires_in": 86400,
-                "user": {"id": 1, "username": "testuser"}
-            }
-            
-            auth_service.create_jwt_token = AsyncMock(
-                return_value=ServiceResult.success_result(
-                    data=mock_token_data,
-                    message="令牌创建成功"
-                )
-            )
+            auth_service.create_jwt_token = self._create_jwt_token_mock
             
             # 测试JWT令牌生成
             token_result = await auth_service.create_jwt_token(user_id=1)
@@ -195,32 +286,9 @@ class IntegrationTestRunner:
             logger.info("测试番剧管理流程...")
             
             anime_service = self.service_factory.anime
-            from src.services.base import ServiceResult
             
             # 模拟番剧搜索
-            mock_search_results = [
-                {
-                    "id": 1,
-                    "title": "测试番剧1",
-                    "type": "TV_SERIES",
-                    "season": 1,
-                    "year": 2024
-                },
-                {
-                    "id": 2, 
-                    "title": "测试番剧2",
-                    "type": "OVA",
-                    "season": 1,
-                    "year": 2024
-                }
-            ]
-            
-            anime_service.search_anime = AsyncMock(
-                return_value=ServiceResult.success_result(
-                    data=mock_search_results,
-                    message="搜索成功"
-                )
-            )
+            anime_service.search_anime = self._search_anime_mock
             
             # 测试番剧搜索
             search_result = await anime_service.search_anime("测试", limit=10)
@@ -228,19 +296,7 @@ class IntegrationTestRunner:
             assert len(search_result.data) == 2
             
             # 模拟番剧详情获取
-            mock_anime_detail = {
-                "anime": mock_search_results[0],
-                "sources": [{"id": 1, "provider_name": "test_provider"}],
-                "episodes_count": 12,
-                "danmaku_count": 5000
-            }
-            
-            anime_service.get_anime_with_details = AsyncMock(
-                return_value=ServiceResult.success_result(
-                    data=mock_anime_detail,
-                    message="获取详情成功"
-                )
-            )
+            anime_service.get_anime_with_details = self._anime_detail_mock
             
             # 测试番剧详情获取
             detail_result = await anime_service.get_anime_with_details(1)
@@ -261,34 +317,9 @@ class IntegrationTestRunner:
             
             episode_service = self.service_factory.episode
             danmaku_service = self.service_factory.danmaku
-            from src.services.base import ServiceResult
             
             # 模拟分集列表获取
-            mock_episodes = {
-                "episodes": [
-                    {
-                        "id": 1,
-                        "title": "第1集",
-                        "episode_index": 1,
-                        "danmaku_count": 100
-                    },
-                    {
-                        "id": 2,
-                        "title": "第2集", 
-                        "episode_index": 2,
-                        "danmaku_count": 150
-                    }
-                ],
-                "total_episodes": 2,
-                "source": {"id": 1, "provider_name": "test_provider"}
-            }
-            
-            episode_service.get_episodes_with_stats = AsyncMock(
-                return_value=ServiceResult.success_result(
-                    data=mock_episodes,
-                    message="获取分集成功"
-                )
-            )
+            episode_service.get_episodes_with_stats = self._episodes_mock
             
             # 测试分集列表获取
             episodes_result = await episode_service.get_episodes_with_stats(
@@ -299,25 +330,7 @@ class IntegrationTestRunner:
             assert len(episodes_result.data["episodes"]) == 2
             
             # 模拟弹幕分析
-            mock_analysis = {
-                "episode": {"id": 1, "title": "第1集"},
-                "basic_stats": {
-                    "total_count": 100,
-                    "average_time_offset": 600.5,
-                    "time_distribution": {0: 10, 1: 15, 2: 20}
-                },
-                "enhanced_stats": {
-                    "color_distribution": {"#FFFFFF": 50, "#FF0000": 30},
-                    "mode_distribution": {"从右至左滚动": 80, "底端固定": 20}
-                }
-            }
-            
-            danmaku_service.analyze_danmaku_patterns = AsyncMock(
-                return_value=ServiceResult.success_result(
-                    data=mock_analysis,
-                    message="弹幕分析完成"
-                )
-            )
+            danmaku_service.analyze_danmaku_patterns = self._danmaku_analysis_mock
             
             # 测试弹幕分析
             analysis_result = await danmaku_service.analyze_danmaku_patterns(
@@ -340,14 +353,9 @@ class IntegrationTestRunner:
             logger.info("测试错误处理...")
             
             anime_service = self.service_factory.anime
-            from src.services.base import ServiceResult, ResourceNotFoundError, ValidationError
             
             # 模拟资源不存在错误
-            anime_service.get_anime_with_details = AsyncMock(
-                return_value=ServiceResult.error_result(
-                    ResourceNotFoundError("Anime", 999)
-                )
-            )
+            anime_service.get_anime_with_details = self._anime_not_found_mock
             
             # 测试资源不存在处理
             not_found_result = await anime_service.get_anime_with_details(999)
@@ -355,11 +363,7 @@ class IntegrationTestRunner:
             assert not_found_result.error.error_code == "RESOURCE_NOT_FOUND"
             
             # 模拟验证错误
-            anime_service.search_anime = AsyncMock(
-                return_value=ServiceResult.error_result(
-                    ValidationError("搜索关键词不能为空", "query")
-                )
-            )
+            anime_service.search_anime = self._search_validation_error_mock
             
             # 测试验证错误处理
             validation_result = await anime_service.search_anime("")
@@ -378,8 +382,6 @@ class IntegrationTestRunner:
         try:
             logger.info("测试服务健康检查...")
             
-            from src.services.base import ServiceResult
-            
             # 模拟各服务的健康检查
             services = [
                 ("anime", self.service_factory.anime),
@@ -390,15 +392,7 @@ class IntegrationTestRunner:
             ]
             
             for service_name, service in services:
-                mock_health_data = {
-                    "service": f"{service_name.title()}Service",
-                    "status": "healthy",
-                    "timestamp": "2024-01-01T00:00:00"
-                }
-                
-                service.health_check = AsyncMock(
-                    return_value=ServiceResult.success_result(mock_health_data)
-                )
+                service.health_check = self._health_check_mocks[service_name]
                 
                 # 测试健康检查
                 health_result = await service.health_check()
@@ -433,26 +427,33 @@ class IntegrationTestRunner:
             ("服务健康检查", self.test_service_health_checks),
         ]
         
-        results = []
-        for test_name, test_func in tests:
-            logger.info(f"\\n📝 执行测试: {test_name}")
-            logger.info("-" * 35)
-            
-            result = await test_func()
-            results.append((test_name, result))
-            self.test_results.append({"test": test_name, "passed": result})
+        details_stream = open(self.details_file, "wb") if self.details_file else None
+        try:
+            for test_name, test_func in tests:
+                logger.info(f"\\n📝 执行测试: {test_name}")
+                logger.info("-" * 35)
+                
+                result = await test_func()
+                self.total_tests += 1
+                if result:
+                    self.passed_tests += 1
+                
+                # 每个测试完成后立即写出一行结果，无需在内存中累积
+                if details_stream:
+                    details_stream.write(orjson.dumps({"test": test_name, "passed": result}) + b"\n")
+                    details_stream.flush()
+                
+                status = "✅ 通过" if result else "❌ 失败"
+                logger.info(f"  {test_name}: {status}")
+        finally:
+            if details_stream:
+                details_stream.close()
         
         # 总结结果
         logger.info("\\n" + "=" * 70)
         logger.info("📊 集成测试结果总结:")
         
-        passed = 0
-        for test_name, result in results:
-            status = "✅ 通过" if result else "❌ 失败"
-            logger.info(f"  {test_name}: {status}")
-            if result:
-                passed += 1
-        
+        passed = self.passed_tests
         logger.info(f"\\n总计: {passed}/{len(tests)} 测试通过")
         
         if passed == len(tests):
@@ -473,21 +474,22 @@ class IntegrationTestRunner:
 
 async def main():
     """主函数"""
-    runner = IntegrationTestRunner()
+    report_file = Path("integration_test_report.json")
+    details_file = Path("integration_test_report.ndjson")
+    
+    runner = IntegrationTestRunner(details_file=details_file)
     success = await runner.run_all_tests()
     
-    # 生成测试报告
-    report_file = Path("integration_test_report.json")
-    with open(report_file, "w", encoding="utf-8") as f:
-        json.dump({
-            "test_run_date": "2024-01-01T00:00:00",
-            "total_tests": len(runner.test_results),
-            "passed_tests": sum(1 for r in runner.test_results if r["passed"]),
-            "overall_result": "PASS" if success else "FAIL",
-            "details": runner.test_results
-        }, f, indent=2, ensure_ascii=False)
+    # 生成测试报告摘要（逐项结果已流式写入 details_file）
+    report_file.write_bytes(orjson.dumps({
+        "test_run_date": "2024-01-01T00:00:00",
+        "total_tests": runner.total_tests,
+        "passed_tests": runner.passed_tests,
+        "overall_result": "PASS" if success else "FAIL",
+        "details_file": details_file.name
+    }, option=orjson.OPT_INDENT_2))
     
-    logger.info(f"\\n📄 测试报告已保存至: {report_file}")
+    logger.info(f"\\n📄 测试报告已保存至: {report_file} (明细: {details_file})")
     
     return success
 
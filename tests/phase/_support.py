@@ -0,0 +1,159 @@
+"""
+Phase 测试辅助工具
+
+测试模块与夹具共用的普通函数和常量，conftest.py 只保留夹具和钩子。
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import get_type_hints
+from unittest.mock import create_autospec
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# 参与参数化测试的数据库类型
+DATABASE_BACKENDS = ("mysql", "postgresql", "sqlite")
+
+# 关系链测试共享的内存数据库URL
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+# Alembic沙箱使用的数据库URL，生成迁移时不会建立任何网络连接
+ALEMBIC_SANDBOX_URL = "sqlite+pysqlite:///:memory:"
+
+
+def run_cli(main) -> None:
+    """脚本入口：优先在uvloop事件循环上运行main()，并以测试结果作为退出码"""
+    try:
+        import uvloop
+    except ImportError:
+        uvloop = None
+    
+    # asyncio.Runner 需要 Python 3.11+，旧版本回退到 asyncio.run
+    if hasattr(asyncio, "Runner"):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop if uvloop else None) as runner:
+            success = runner.run(main())
+    else:
+        if uvloop:
+            uvloop.install()
+        success = asyncio.run(main())
+    sys.exit(0 if success else 1)
+
+
+def load_models_meta() -> SimpleNamespace:
+    """导入全部ORM模型，并预先统计每张表的约束数和索引数"""
+    from src.database import models
+    
+    tables = models.Base.metadata.tables
+    # {表名: (约束数, 索引数)}
+    stats = {name: (len(table.constraints), len(table.indexes)) for name, table in tables.items()}
+    # 一次遍历同时汇总约束总数和索引总数
+    constraint_total, index_total = map(sum, zip(*stats.values()))
+    return SimpleNamespace(
+        **{name: getattr(models, name) for name in models.__all__},
+        tables=tables,
+        stats=stats,
+        constraint_total=constraint_total,
+        index_total=index_total,
+    )
+
+
+def load_pool_configs() -> dict:
+    """计算每种数据库的连接池配置"""
+    from src.database.optimization import DatabaseOptimizer
+    
+    return {backend: DatabaseOptimizer.configure_connection_pool(backend) for backend in DATABASE_BACKENDS}
+
+
+def load_database_indexes() -> dict:
+    """获取每种数据库的专用索引定义"""
+    from src.database.optimization import get_database_specific_indexes
+    
+    return {backend: get_database_specific_indexes(backend) for backend in DATABASE_BACKENDS}
+
+
+async def create_test_engine():
+    """创建测试共享的内存数据库引擎，并建好番剧→弹幕关系链涉及的表"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import StaticPool
+    from src.database.models import Base, Anime, AnimeMetadata, AnimeAlias, AnimeSource, Episode, Comment
+    
+    # 内存库随连接销毁，StaticPool让所有会话复用同一连接，表结构只需创建一次
+    engine = create_async_engine(TEST_DATABASE_URL, poolclass=StaticPool)
+    # SQLite的索引名在库内全局唯一，只创建关系链涉及的表
+    tables = [model.__table__ for model in (Anime, AnimeMetadata, AnimeAlias, AnimeSource, Episode, Comment)]
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+    return engine
+
+
+@asynccontextmanager
+async def rollback_session(engine):
+    """打开一个会话，退出时回滚，各测试写入的数据互不可见"""
+    from sqlalchemy.ext.asyncio import AsyncSession
+    
+    async with AsyncSession(engine) as session:
+        try:
+            yield session
+        finally:
+            await session.rollback()
+
+
+def build_repo_mock():
+    """
+    构造按真实接口生成spec的模拟Repository工厂
+    
+    Repository方法中的异步方法会自动成为AsyncMock，调用不存在的方法则直接报错
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from src.database.repositories.factory import RepositoryFactory
+    
+    mock_repos = create_autospec(RepositoryFactory, instance=True)
+    # autospec不会为property按返回类型生成spec，逐个补上对应的Repository
+    for name, attr in vars(RepositoryFactory).items():
+        if isinstance(attr, property):
+            setattr(mock_repos, name, create_autospec(get_type_hints(attr.fget)["return"], instance=True))
+    # session是实例属性，同样需要单独补上
+    mock_repos.session = create_autospec(AsyncSession, instance=True)
+    return mock_repos
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """以硬链接方式放置只读文件，跨文件系统等无法链接时退回复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy(src, dst)
+
+
+def build_alembic_sandbox(sandbox_dir: Path):
+    """
+    在 sandbox_dir 下搭建一份独立的Alembic目录结构
+    
+    Args:
+        sandbox_dir: 沙箱根目录（需已存在）
+        
+    Returns:
+        指向沙箱的 alembic.config.Config
+    """
+    from alembic.config import Config
+    
+    script_dir = sandbox_dir / "alembic"
+    (script_dir / "versions").mkdir(parents=True)
+    # env.py 与模板只会被Alembic读取，无需真正复制
+    _link_or_copy(PROJECT_ROOT / "alembic" / "env.py", script_dir / "env.py")
+    _link_or_copy(PROJECT_ROOT / "alembic" / "script.py.mako", script_dir / "script.py.mako")
+    
+    # 复制alembic.ini并将脚本目录指向沙箱
+    ini_content = (PROJECT_ROOT / "alembic.ini").read_text(encoding="utf-8")
+    ini_content = ini_content.replace("script_location = alembic", f"script_location = {script_dir}")
+    ini_path = sandbox_dir / "alembic.ini"
+    ini_path.write_text(ini_content, encoding="utf-8")
+    
+    alembic_cfg = Config(str(ini_path))
+    alembic_cfg.set_main_option("sqlalchemy.url", ALEMBIC_SANDBOX_URL)
+    return alembic_cfg
@@ -0,0 +1,78 @@
+"""
+Phase 测试共享夹具
+
+将模型导入、元数据统计等只读的准备工作集中在会话级夹具中，只执行一次。
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from tests.phase._support import (
+    build_alembic_sandbox, build_repo_mock, create_test_engine, load_database_indexes, load_models_meta,
+    load_pool_configs, rollback_session
+)
+
+
+# 该钩子自pytest-asyncio 1.4.0起提供，标记为可选后旧版本直接忽略并使用默认事件循环
+@pytest.hookimpl(optionalhook=True)
+def pytest_asyncio_loop_factories(config, item):
+    """pytest-asyncio钩子：安装了uvloop时，Phase测试运行在uvloop事件循环上"""
+    try:
+        import uvloop
+    except ImportError:
+        return {"asyncio": asyncio.new_event_loop}
+    return {"uvloop": uvloop.new_event_loop}
+
+
+@pytest.fixture(scope="session")
+def models_meta() -> SimpleNamespace:
+    """会话级共享的模型元数据"""
+    return load_models_meta()
+
+
+@pytest.fixture(scope="session")
+async def db_engine():
+    """会话级共享的数据库引擎"""
+    engine = await create_test_engine()
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db_session(db_engine):
+    """每个测试独立的会话，结束时回滚"""
+    async with rollback_session(db_engine) as session:
+        yield session
+
+
+@pytest.fixture(scope="session")
+def repo_mock_template():
+    """会话级共享的模拟Repository工厂，生成spec的开销只付一次"""
+    return build_repo_mock()
+
+
+@pytest.fixture
+def mock_repos(repo_mock_template):
+    """每个测试使用的模拟Repository工厂，测试结束后重置调用记录和返回值"""
+    yield repo_mock_template
+    repo_mock_template.reset_mock(return_value=True, side_effect=True)
+
+
+@pytest.fixture(scope="session")
+def pool_cfg() -> dict:
+    """会话级共享的连接池配置 {数据库类型: 配置}"""
+    return load_pool_configs()
+
+
+@pytest.fixture(scope="session")
+def indexes() -> dict:
+    """会话级共享的专用索引定义 {数据库类型: 索引}"""
+    return load_database_indexes()
+
+
+@pytest.fixture(scope="session")
+def alembic_sandbox(tmp_path_factory):
+    """会话级共享的Alembic沙箱配置"""
+    return build_alembic_sandbox(tmp_path_factory.mktemp("alembic_sandbox"))
@@ -6,111 +6,94 @@ Phase 1 基础架构测试脚本
 
 import asyncio
 import logging
-from pathlib import Path
-import sys
+import os
 
-# 添加src目录到Python路径
-project_root = Path(__file__).parent
-sys.path.insert(0, str(project_root / "src"))
+from tests.phase._support import run_cli
 
 # 设置日志
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
+# 引擎测试使用内存SQLite（NullPool），不加载MySQL/PostgreSQL驱动，也不预建连接池
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+# 全部测试通过后输出的完成信息，一次性写出
+_COMPLETION_BANNER = (
+    "🎉 Phase 1 基础架构搭建完成！",
+    "\n下一步可以进行:",
+    "  1. Phase 2: 核心模型定义",
+    "  2. 初始化Alembic迁移",
+    "  3. 创建第一个ORM模型",
+)
+
 
 async def test_database_configuration():
     """测试数据库配置"""
-    try:
-        from src.config import settings
-        
-        logger.info("测试数据库配置...")
-        
-        # 测试配置属性
-        logger.info(f"数据库类型: {settings.database.type}")
-        logger.info(f"异步URL: {settings.database.async_url}")
-        logger.info(f"同步URL: {settings.database.sync_url}")
-        
-        # 测试引擎配置
-        engine_config = settings.database.get_engine_config()
-        logger.info(f"引擎配置: {engine_config}")
-        
-        logger.info("✅ 数据库配置测试通过")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ 数据库配置测试失败: {e}")
-        return False
+    from src.config import settings
+    
+    logger.info("测试数据库配置...")
+    
+    # 测试配置属性
+    logger.info("数据库类型: %s", settings.database.type)
+    logger.info("异步URL: %s", settings.database.async_url)
+    logger.info("同步URL: %s", settings.database.sync_url)
+    
+    # 测试引擎配置
+    engine_config = settings.database.get_engine_config()
+    logger.info("引擎配置: %s", engine_config)
+    
+    logger.info("✅ 数据库配置测试通过")
 
 
 async def test_database_engine():
     """测试数据库引擎"""
-    try:
-        from src.database.engine import DatabaseEngine
-        from src.config import settings
-        
-        logger.info("测试数据库引擎...")
-        
-        # 创建引擎实例
-        database_url = settings.database.async_url
-        engine_config = settings.database.get_engine_config()
-        
-        engine = DatabaseEngine(database_url, **engine_config)
-        
-        logger.info(f"引擎创建成功: {engine}")
-        logger.info(f"数据库类型: {engine.database_type}")
-        
-        # 关闭引擎
-        await engine.close()
-        
-        logger.info("✅ 数据库引擎测试通过")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ 数据库引擎测试失败: {e}")
-        return False
+    from src.database.engine import DatabaseEngine
+    from sqlalchemy.pool import NullPool
+    
+    logger.info("测试数据库引擎...")
+    
+    # 创建引擎实例（NullPool不接受pool_size/max_overflow等连接池参数）
+    engine = DatabaseEngine(TEST_DATABASE_URL, poolclass=NullPool)
+    
+    logger.info("引擎创建成功: %s", engine)
+    logger.info("数据库类型: %s", engine.database_type)
+    assert engine.database_type == "sqlite"
+    
+    # 关闭引擎
+    await engine.close()
+    
+    logger.info("✅ 数据库引擎测试通过")
 
 
 async def test_base_models():
     """测试基础模型"""
-    try:
-        from src.database.models.base import Base, IDMixin, TimestampMixin
-        
-        logger.info("测试基础模型...")
-        
-        # 测试基础类
-        assert hasattr(Base, 'metadata')
-        assert hasattr(Base, 'registry')
-        
-        # 测试混入类
-        assert hasattr(IDMixin, 'id')
-        assert hasattr(TimestampMixin, 'created_at')
-        assert hasattr(TimestampMixin, 'updated_at')
-        
-        logger.info("✅ 基础模型测试通过")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ 基础模型测试失败: {e}")
-        return False
+    from src.database.models.base import Base, IDMixin, TimestampMixin
+    
+    logger.info("测试基础模型...")
+    
+    # 测试基础类
+    assert hasattr(Base, 'metadata')
+    assert hasattr(Base, 'registry')
+    
+    # 测试混入类
+    assert hasattr(IDMixin, 'id')
+    assert hasattr(TimestampMixin, 'created_at')
+    assert hasattr(TimestampMixin, 'updated_at')
+    
+    logger.info("✅ 基础模型测试通过")
 
 
 async def test_database_initialization():
     """测试数据库初始化模块"""
-    try:
-        from src.database import initialize_database, shutdown_database
-        
-        logger.info("测试数据库初始化模块...")
-        
-        # 这些函数应该可以导入而不出错
-        assert callable(initialize_database)
-        assert callable(shutdown_database)
-        
-        logger.info("✅ 数据库初始化模块测试通过")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ 数据库初始化模块测试失败: {e}")
-        return False
+    from src.database import initialize_database, shutdown_database
+    
+    logger.info("测试数据库初始化模块...")
+    
+    # 这些函数应该可以导入而不出错
+    assert callable(initialize_database)
+    assert callable(shutdown_database)
+    
+    logger.info("✅ 数据库初始化模块测试通过")
 
 
 async def main():
@@ -125,32 +108,33 @@ async def main():
         ("初始化模块", test_database_initialization),
     ]
     
-    results = []
-    for test_name, test_func in tests:
-        logger.info(f"\n📝 测试: {test_name}")
-        logger.info("-" * 30)
-        result = await test_func()
-        results.append((test_name, result))
+    # 各测试之间相互独立，并发执行以缩短总耗时
+    outcomes = await asyncio.gather(
+        *(test_func() for _, test_func in tests),
+        return_exceptions=True
+    )
+    # 测试函数通过断言/异常报告失败，没有异常即视为通过
+    results = [
+        (test_name, outcome)
+        for (test_name, _), outcome in zip(tests, outcomes)
+    ]
     
     # 总结结果
     logger.info("\n" + "=" * 50)
     logger.info("📊 测试结果总结:")
     
     passed = 0
-    for test_name, result in results:
-        status = "✅ 通过" if result else "❌ 失败"
-        logger.info(f"  {test_name}: {status}")
-        if result:
+    for test_name, outcome in results:
+        if isinstance(outcome, BaseException):
+            logger.error("  %s: ❌ 失败 (%r)", test_name, outcome)
+        else:
+            logger.info("  %s: ✅ 通过", test_name)
             passed += 1
     
-    logger.info(f"\n总计: {passed}/{len(tests)} 测试通过")
+    logger.info("\n总计: %s/%s 测试通过", passed, len(tests))
     
     if passed == len(tests):
-        logger.info("🎉 Phase 1 基础架构搭建完成！")
-        logger.info("\n下一步可以进行:")
-        logger.info("  1. Phase 2: 核心模型定义")
-        logger.info("  2. 初始化Alembic迁移")
-        logger.info("  3. 创建第一个ORM模型")
+        logger.info("\n".join(_COMPLETION_BANNER))
     else:
         logger.error("⚠️  部分测试失败，需要修复后再继续")
     
@@ -158,4 +142,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run_cli(main)
\ No newline at end of file
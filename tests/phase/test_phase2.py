@@ -6,299 +6,252 @@ Phase 2 模型测试脚本
 
 import asyncio
 import logging
+import os
 from pathlib import Path
-import sys
+import tempfile
 
-# 添加src目录到Python路径
-project_root = Path(__file__).parent
-sys.path.insert(0, str(project_root / "src"))
+import pytest
+
+from tests.phase._support import (
+    DATABASE_BACKENDS, build_alembic_sandbox, create_test_engine, load_database_indexes, load_models_meta,
+    load_pool_configs, rollback_session, run_cli
+)
 
 # 设置日志
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
+# 各数据库连接池配置中必须包含的键
+_POOL_CONFIG_KEYS = {"mysql": "pool_size", "postgresql": "pool_size", "sqlite": "poolclass"}
+
+# 期望存在的全部数据表
+_EXPECTED_TABLES = frozenset({
+    'anime', 'anime_sources', 'anime_metadata', 'anime_aliases', 
+    'tmdb_episode_mapping', 'episode', 'comment', 'users', 
+    'api_tokens', 'token_access_logs', 'bangumi_auth', 'oauth_states',
+    'ua_rules', 'config', 'cache_data', 'scrapers', 
+    'scheduled_tasks', 'task_history'
+})
+
+# 全部测试通过后输出的完成信息，一次性写出
+_COMPLETION_BANNER = (
+    "🎉 Phase 2 核心模型定义完成！",
+    "\n已完成的工作:",
+    "  ✅ 15个数据库表的ORM模型",
+    "  ✅ 完整的表关系和约束定义",
+    "  ✅ 数据库特定优化配置",
+    "  ✅ Alembic迁移支持",
+    "\n下一步可以进行:",
+    "  1. Phase 3: Repository模式实现",
+    "  2. 生成和执行数据库迁移",
+    "  3. 创建第一个Repository类",
+)
+
 
 async def test_model_imports():
     """测试模型导入"""
-    try:
-        logger.info("测试模型导入...")
-        
-        # 测试基类导入
-        from src.database.models.base import Base, IDMixin, TimestampMixin
-        
-        # 测试番剧模型导入
-        from src.database.models.anime import (
-            AnimeType, Anime, AnimeSource, AnimeMetadata, 
-            AnimeAlias, TMDBEpisodeMapping
-        )
-        
-        # 测试分集模型导入
-        from src.database.models.episode import Episode, Comment
-        
-        # 测试用户模型导入
-        from src.database.models.user import (
-            User, APIToken, TokenAccessLog, BangumiAuth, 
-            OAuthState, UARules
-        )
-        
-        # 测试系统模型导入
-        from src.database.models.system import (
-            Config, CacheData, Scraper, ScheduledTask, TaskHistory
-        )
-        
-        # 测试统一导入
-        from src.database.models import Base as ModelsBase
-        assert Base is ModelsBase
-        
-        logger.info("✅ 模型导入测试通过")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ 模型导入测试失败: {e}")
-        return False
+    logger.info("测试模型导入...")
+    
+    # 测试基类导入
+    from src.database.models.base import Base, IDMixin, TimestampMixin
+    
+    # 测试番剧模型导入
+    from src.database.models.anime import (
+        AnimeType, Anime, AnimeSource, AnimeMetadata, 
+        AnimeAlias, TMDBEpisodeMapping
+    )
+    
+    # 测试分集模型导入
+    from src.database.models.episode import Episode, Comment
+    
+    # 测试用户模型导入
+    from src.database.models.user import (
+        User, APIToken, TokenAccessLog, BangumiAuth, 
+        OAuthState, UARules
+    )
+    
+    # 测试系统模型导入
+    from src.database.models.system import (
+        Config, CacheData, Scraper, ScheduledTask, TaskHistory
+    )
+    
+    # 测试统一导入
+    from src.database.models import Base as ModelsBase
+    assert Base is ModelsBase
+    
+    logger.info("✅ 模型导入测试通过")
 
 
-async def test_model_metadata():
+async def test_model_metadata(models_meta):
     """测试模型元数据"""
-    try:
-        logger.info("测试模型元数据...")
-        
-        from src.database.models import Base
-        
-        # 检查元数据
-        metadata = Base.metadata
-        logger.info(f"发现 {len(metadata.tables)} 个数据表")
-        
-        # 列出所有表
-        table_names = list(metadata.tables.keys())
-        expected_tables = {
-            'anime', 'anime_sources', 'anime_metadata', 'anime_aliases', 
-            'tmdb_episode_mapping', 'episode', 'comment', 'users', 
-            'api_tokens', 'token_access_logs', 'bangumi_auth', 'oauth_states',
-            'ua_rules', 'config', 'cache_data', 'scrapers', 
-            'scheduled_tasks', 'task_history'
-        }
-        
-        logger.info(f"期望表: {len(expected_tables)}")
-        logger.info(f"发现表: {table_names}")
-        
-        # 检查是否有遗漏的表
-        missing_tables = expected_tables - set(table_names)
-        extra_tables = set(table_names) - expected_tables
-        
-        if missing_tables:
-            logger.error(f"缺少表: {missing_tables}")
-            return False
-        
-        if extra_tables:
-            logger.warning(f"额外的表: {extra_tables}")
-        
-        logger.info("✅ 模型元数据测试通过")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ 模型元数据测试失败: {e}")
-        return False
+    logger.info("测试模型元数据...")
+    
+    # 检查元数据
+    tables = models_meta.tables
+    logger.info("发现 %s 个数据表", len(tables))
+    
+    # 列出所有表（KeysView 本身支持集合运算）
+    table_names = tables.keys()
+    
+    logger.info("期望表: %s", len(_EXPECTED_TABLES))
+    logger.info("发现表: %s", list(table_names))
+    
+    # 检查是否有遗漏的表
+    missing_tables = _EXPECTED_TABLES - table_names
+    extra_tables = table_names - _EXPECTED_TABLES
+    
+    assert not missing_tables, f"缺少表: {missing_tables}"
+    
+    if extra_tables:
+        logger.warning("额外的表: %s", extra_tables)
+    
+    logger.info("✅ 模型元数据测试通过")
 
 
-async def test_model_relationships():
+async def test_model_relationships(models_meta):
     """测试模型关系"""
-    try:
-        logger.info("测试模型关系...")
-        
-        from src.database.models import Anime, AnimeSource, Episode, Comment, User, APIToken
-        
-        # 测试Anime关系
-        anime_relationships = [
-            'sources', 'anime_metadata', 'aliases'
-        ]
-        for rel_name in anime_relationships:
-            assert hasattr(Anime, rel_name), f"Anime缺少关系: {rel_name}"
-        
-        # 测试AnimeSource关系
-        assert hasattr(AnimeSource, 'anime'), "AnimeSource缺少anime关系"
-        assert hasattr(AnimeSource, 'episodes'), "AnimeSource缺少episodes关系"
-        
-        # 测试Episode关系
-        assert hasattr(Episode, 'source'), "Episode缺少source关系"
-        assert hasattr(Episode, 'comments'), "Episode缺少comments关系"
-        
-        # 测试Comment关系
-        assert hasattr(Comment, 'episode'), "Comment缺少episode关系"
-        
-        # 测试User关系
-        assert hasattr(User, 'bangumi_auth'), "User缺少bangumi_auth关系"
-        assert hasattr(User, 'oauth_states'), "User缺少oauth_states关系"
-        
-        # 测试APIToken关系
-        assert hasattr(APIToken, 'access_logs'), "APIToken缺少access_logs关系"
-        
-        logger.info("✅ 模型关系测试通过")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ 模型关系测试失败: {e}")
-        return False
+    logger.info("测试模型关系...")
+    
+    # 每个模型期望具备的关系
+    expected_relationships = {
+        models_meta.Anime: {'sources', 'anime_metadata', 'aliases'},
+        models_meta.AnimeSource: {'anime', 'episodes'},
+        models_meta.Episode: {'source', 'comments'},
+        models_meta.Comment: {'episode'},
+        models_meta.User: {'bangumi_auth', 'oauth_states'},
+        models_meta.APIToken: {'access_logs'},
+    }
+    
+    # 直接读取mapper上的关系集合，而不是逐个hasattr
+    for model, rel_names in expected_relationships.items():
+        missing = rel_names - set(model.__mapper__.relationships.keys())
+        assert not missing, f"{model.__name__}缺少关系: {missing}"
+    
+    logger.info("✅ 模型关系测试通过")
 
 
-async def test_model_constraints():
+async def test_model_constraints(models_meta):
     """测试模型约束"""
-    try:
-        logger.info("测试模型约束...")
-        
-        from src.database.models import Base
-        
-        # 检查表的约束
-        constraint_count = 0
-        index_count = 0
-        
-        for table_name, table in Base.metadata.tables.items():
-            # 统计约束
-            constraint_count += len(table.constraints)
-            # 统计索引
-            index_count += len(table.indexes)
-        
-        logger.info(f"总约束数: {constraint_count}")
-        logger.info(f"总索引数: {index_count}")
-        
-        # 检查关键表的约束
-        anime_table = Base.metadata.tables['anime']
-        assert len(anime_table.indexes) > 0, "anime表缺少索引"
-        
-        comment_table = Base.metadata.tables['comment']
-        assert len(comment_table.indexes) > 0, "comment表缺少索引"
-        
-        logger.info("✅ 模型约束测试通过")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ 模型约束测试失败: {e}")
-        return False
+    logger.info("测试模型约束...")
+    
+    # 使用夹具中预先统计的 {表名: (约束数, 索引数)} 及其汇总
+    stats = models_meta.stats
+    
+    logger.info("总约束数: %s", models_meta.constraint_total)
+    logger.info("总索引数: %s", models_meta.index_total)
+    
+    # 检查关键表的约束
+    assert stats['anime'][1] > 0, "anime表缺少索引"
+    assert stats['comment'][1] > 0, "comment表缺少索引"
+    
+    logger.info("✅ 模型约束测试通过")
 
 
-async def test_alembic_migration_generation():
+async def test_alembic_migration_generation(alembic_sandbox):
     """测试Alembic迁移生成"""
-    try:
-        logger.info("测试Alembic迁移生成...")
-        
-        # 导入Alembic相关模块
-        from alembic.config import Config
-        from alembic.script import ScriptDirectory
-        from alembic import command
-        import tempfile
-        import os
-        
-        # 创建临时目录
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # 复制alembic配置到临时目录
-            alembic_cfg_path = project_root / "alembic.ini"
-            temp_alembic_cfg = Path(temp_dir) / "alembic.ini"
-            
-            # 读取原配置
-            with open(alembic_cfg_path, 'r') as f:
-                alembic_config_content = f.read()
-            
-            # 修改配置指向临时目录
-            alembic_config_content = alembic_config_content.replace(
-                "script_location = alembic",
-                f"script_location = {temp_dir}/alembic"
-            )
-            
-            # 写入临时配置
-            with open(temp_alembic_cfg, 'w') as f:
-                f.write(alembic_config_content)
-            
-            # 创建临时alembic目录结构
-            temp_alembic_dir = Path(temp_dir) / "alembic"
-            temp_alembic_dir.mkdir()
-            
-            # 复制env.py
-            import shutil
-            shutil.copy(project_root / "alembic" / "env.py", temp_alembic_dir / "env.py")
-            shutil.copy(project_root / "alembic" / "script.py.mako", temp_alembic_dir / "script.py.mako")
-            (temp_alembic_dir / "versions").mkdir()
-            
-            # 创建Alembic配置对象
-            alembic_cfg = Config(str(temp_alembic_cfg))
-            
-            try:
-                # 尝试生成初始迁移
-                command.revision(alembic_cfg, message="Initial migration", autogenerate=False)
-                
-                # 检查是否生成了迁移文件
-                versions_dir = temp_alembic_dir / "versions"
-                migration_files = list(versions_dir.glob("*.py"))
-                
-                if migration_files:
-                    logger.info(f"成功生成迁移文件: {migration_files[0].name}")
-                    
-                    # 读取迁移文件内容
-                    with open(migration_files[0], 'r') as f:
-                        migration_content = f.read()
-                    
-                    if 'def upgrade()' in migration_content and 'def downgrade()' in migration_content:
-                        logger.info("✅ Alembic迁移生成测试通过")
-                        return True
-                    else:
-                        logger.error("生成的迁移文件格式不正确")
-                        return False
-                else:
-                    logger.error("未生成迁移文件")
-                    return False
-            
-            except Exception as e:
-                # 如果不能连接数据库，这是预期的
-                if "数据库连接" in str(e) or "connect" in str(e).lower():
-                    logger.info("✅ Alembic配置正确（无法连接数据库是预期的）")
-                    return True
-                else:
-                    raise
-        
-    except Exception as e:
-        logger.error(f"❌ Alembic迁移生成测试失败: {e}")
-        return False
+    logger.info("测试Alembic迁移生成...")
+    
+    from alembic import command
+    
+    # 沙箱目录结构由会话级夹具搭建，这里只负责生成迁移
+    alembic_cfg = alembic_sandbox
+    
+    # 生成初始迁移（沙箱指向内存SQLite，不会连接任何数据库）
+    command.revision(alembic_cfg, message="Initial migration", autogenerate=False)
+    
+    # 检查是否生成了迁移文件
+    versions_dir = Path(alembic_cfg.get_main_option("script_location")) / "versions"
+    with os.scandir(versions_dir) as entries:
+        migration_file = next((entry for entry in entries if entry.name.endswith(".py")), None)
+    
+    assert migration_file, "未生成迁移文件"
+    logger.info("成功生成迁移文件: %s", migration_file.name)
+    
+    # 直接在原始字节上检查，无需解码整个文件
+    migration_content = Path(migration_file.path).read_bytes()
+    assert b'def upgrade()' in migration_content and b'def downgrade()' in migration_content, \
+        "生成的迁移文件格式不正确"
+    
+    logger.info("✅ Alembic迁移生成测试通过")
 
 
 async def test_database_optimization():
     """测试数据库优化配置"""
+    logger.info("测试数据库优化配置...")
+    
+    from src.database.optimization import DatabaseOptimizer
+    
+    # 测试优化器类
+    optimizer = DatabaseOptimizer()
+    assert hasattr(optimizer, 'configure_mysql_optimizations')
+    assert hasattr(optimizer, 'configure_postgresql_optimizations')
+    assert hasattr(optimizer, 'configure_sqlite_optimizations')
+    
+    logger.info("✅ 数据库优化配置测试通过")
+
+
+@pytest.mark.parametrize("backend", DATABASE_BACKENDS)
+async def test_database_backend_optimization(backend, pool_cfg, indexes):
+    """测试各数据库的连接池与索引配置"""
+    # 测试连接池配置
+    assert _POOL_CONFIG_KEYS[backend] in pool_cfg[backend]
+    
+    # 测试索引配置
+    assert 'anime' in indexes[backend]
+
+
+async def test_no_n_plus_one(db_session):
+    """测试预加载关系链时不会退化为N+1查询"""
+    logger.info("测试N+1查询防护...")
+    
+    from sqlalchemy import event, select
+    from sqlalchemy.orm import raiseload, selectinload
+    from src.database.models import Anime, AnimeSource, Episode, Comment
+    
+    # 1个番剧 -> 2个数据源 -> 每个3集 -> 每集2条弹幕
+    db_session.add(Anime(id=1, title="测试番剧"))
+    for source_id in (1, 2):
+        db_session.add(AnimeSource(id=source_id, anime_id=1, provider_name="test", media_id=f"media_{source_id}"))
+        for index in range(1, 4):
+            episode_id = source_id * 10 + index
+            db_session.add(Episode(id=episode_id, source_id=source_id, title=f"第{index}集", episode_index=index))
+            for n in range(2):
+                db_session.add(Comment(
+                    id=episode_id * 10 + n, episode_id=episode_id, cid=f"{episode_id}_{n}",
+                    p="1.0,1,25,16777215,0,0,id,hash", m="弹幕", t=n
+                ))
+    # 写入当前事务后清空身份映射，迫使遍历时真正从数据库加载
+    await db_session.flush()
+    db_session.expunge_all()
+    
+    # 只统计遍历阶段发出的SQL
+    queries = []
+    
+    def count_query(conn, cursor, statement, *args):
+        queries.append(statement)
+    
+    sync_engine = db_session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", count_query)
     try:
-        logger.info("测试数据库优化配置...")
-        
-        from src.database.optimization import (
-            DatabaseOptimizer, configure_database_optimizations,
-            get_database_specific_indexes
+        stmt = select(Anime).options(
+            selectinload(Anime.sources).selectinload(AnimeSource.episodes).selectinload(Episode.comments),
+            raiseload("*")
+        )
+        anime_list = (await db_session.execute(stmt)).scalars().all()
+        comment_total = sum(
+            len(episode.comments)
+            for anime in anime_list
+            for source in anime.sources
+            for episode in source.episodes
         )
-        
-        # 测试优化器类
-        optimizer = DatabaseOptimizer()
-        assert hasattr(optimizer, 'configure_mysql_optimizations')
-        assert hasattr(optimizer, 'configure_postgresql_optimizations')
-        assert hasattr(optimizer, 'configure_sqlite_optimizations')
-        
-        # 测试连接池配置
-        mysql_config = optimizer.configure_connection_pool('mysql')
-        postgresql_config = optimizer.configure_connection_pool('postgresql')
-        sqlite_config = optimizer.configure_connection_pool('sqlite')
-        
-        assert 'pool_size' in mysql_config
-        assert 'pool_size' in postgresql_config
-        assert 'poolclass' in sqlite_config
-        
-        # 测试索引配置
-        mysql_indexes = get_database_specific_indexes('mysql')
-        postgresql_indexes = get_database_specific_indexes('postgresql')
-        sqlite_indexes = get_database_specific_indexes('sqlite')
-        
-        assert 'anime' in mysql_indexes
-        assert 'anime' in postgresql_indexes
-        assert 'anime' in sqlite_indexes
-        
-        logger.info("✅ 数据库优化配置测试通过")
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ 数据库优化配置测试失败: {e}")
-        return False
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", count_query)
+    
+    assert comment_total == 12, f"弹幕数量不符: {comment_total}"
+    # 每条关系路径最多一次查询：anime, sources, episodes, comments
+    assert len(queries) <= 4, f"遍历关系链发出了 {len(queries)} 条查询"
+    
+    logger.info("✅ N+1查询防护测试通过")
 
 
 async def main():
@@ -306,46 +259,63 @@ async def main():
     logger.info("🚀 开始 Phase 2 模型定义测试")
     logger.info("=" * 50)
     
+    models_meta = load_models_meta()
+    pool_cfg = load_pool_configs()
+    indexes = load_database_indexes()
+    alembic_dir = tempfile.TemporaryDirectory()
+    alembic_sandbox = build_alembic_sandbox(Path(alembic_dir.name))
+    db_engine = await create_test_engine()
+    
+    async def run_with_session(test_func):
+        async with rollback_session(db_engine) as db_session:
+            await test_func(db_session)
+    
     tests = [
         ("模型导入", test_model_imports),
-        ("模型元数据", test_model_metadata),
-        ("模型关系", test_model_relationships),
-        ("模型约束", test_model_constraints),
-        ("Alembic迁移", test_alembic_migration_generation),
+        ("模型元数据", lambda: test_model_metadata(models_meta)),
+        ("模型关系", lambda: test_model_relationships(models_meta)),
+        ("模型约束", lambda: test_model_constraints(models_meta)),
+        ("Alembic迁移", lambda: test_alembic_migration_generation(alembic_sandbox)),
         ("数据库优化", test_database_optimization),
+        *(
+            (f"数据库优化[{backend}]",
+             lambda backend=backend: test_database_backend_optimization(backend, pool_cfg, indexes))
+            for backend in DATABASE_BACKENDS
+        ),
+        ("N+1查询防护", lambda: run_with_session(test_no_n_plus_one)),
     ]
     
-    results = []
-    for test_name, test_func in tests:
-        logger.info(f"\n📝 测试: {test_name}")
-        logger.info("-" * 30)
-        result = await test_func()
-        results.append((test_name, result))
+    # 各测试之间相互独立，并发执行以缩短总耗时
+    try:
+        with alembic_dir:
+            outcomes = await asyncio.gather(
+                *(test_func() for _, test_func in tests),
+                return_exceptions=True
+            )
+    finally:
+        await db_engine.dispose()
+    # 测试函数通过断言/异常报告失败，没有异常即视为通过
+    results = [
+        (test_name, outcome)
+        for (test_name, _), outcome in zip(tests, outcomes)
+    ]
     
     # 总结结果
     logger.info("\n" + "=" * 50)
     logger.info("📊 测试结果总结:")
     
     passed = 0
-    for test_name, result in results:
-        status = "✅ 通过" if result else "❌ 失败"
-        logger.info(f"  {test_name}: {status}")
-        if result:
+    for test_name, outcome in results:
+        if isinstance(outcome, BaseException):
+            logger.error("  %s: ❌ 失败 (%r)", test_name, outcome)
+        else:
+            logger.info("  %s: ✅ 通过", test_name)
             passed += 1
     
-    logger.info(f"\n总计: {passed}/{len(tests)} 测试通过")
+    logger.info("\n总计: %s/%s 测试通过", passed, len(tests))
     
     if passed == len(tests):
-        logger.info("🎉 Phase 2 核心模型定义完成！")
-        logger.info("\n已完成的工作:")
-        logger.info("  ✅ 15个数据库表的ORM模型")
-        logger.info("  ✅ 完整的表关系和约束定义")
-        logger.info("  ✅ 数据库特定优化配置")
-        logger.info("  ✅ Alembic迁移支持")
-        logger.info("\n下一步可以进行:")
-        logger.info("  1. Phase 3: Repository模式实现")
-        logger.info("  2. 生成和执行数据库迁移")
-        logger.info("  3. 创建第一个Repository类")
+        logger.info("\n".join(_COMPLETION_BANNER))
     else:
         logger.error("⚠️  部分测试失败，需要修复后再继续")
     
@@ -353,4 +323,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run_cli(main)
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""
+弹幕参数解析器单元测试
+
+运行方式: pytest tests/unit/test_danmaku_parser.py
+"""
+
+import pytest
+
+from src.database.repositories.danmaku_parser import DanmakuParamsParser
+
+
+def test_parse_standard_params():
+    """标准8段参数字符串解析出全部字段"""
+    result = DanmakuParamsParser.parse_params_string("23.5,1,25,16777215,1609459200,0,test_id,user_hash_123")
+    
+    assert result == {
+        'time': 23.5,
+        'mode': 1,
+        'font_size': 25,
+        'color': 16777215,
+        'timestamp': 1609459200,
+        'pool': 0,
+        'danmaku_id': 'test_id',
+        'user_hash': 'user_hash_123',
+    }
+
+
+def test_parse_negative_time():
+    """负数时间照常解析"""
+    result = DanmakuParamsParser.parse_params_string("-1.5,1,25,255,1609459200,0,test_id,user_hash")
+    
+    assert result['time'] == -1.5
+    assert result['color'] == 255
+
+
+def test_parse_extra_fields():
+    """多余字段被忽略，只取前8段"""
+    result = DanmakuParamsParser.parse_params_string("23.5,1,25,255,1609459200,0,test_id,user_hash,extra,more")
+    
+    assert result['danmaku_id'] == 'test_id'
+    assert result['user_hash'] == 'user_hash'
+    assert len(result) == 8
+
+
+def test_parse_keeps_full_color_value():
+    """超过24位的颜色值原样保留，不做截断"""
+    result = DanmakuParamsParser.parse_params_string("23.5,1,25,4294967295,1609459200,0,test_id,user_hash")
+    
+    assert result['color'] == 4294967295
+
+
+@pytest.mark.parametrize("params", [
+    "1.2.3,1,25,255,1609459200,0,test_id,user_hash",  # 时间格式错误
+    "23.5,x,25,255,1609459200,0,test_id,user_hash",  # 模式不是整数
+    "23.5,1,25,0xFF,1609459200,0,test_id,user_hash",  # 颜色不是十进制整数
+])
+def test_parse_malformed_numbers(params):
+    """数值字段格式错误时返回空字典"""
+    assert DanmakuParamsParser.parse_params_string(params) == {}
+
+
+@pytest.mark.parametrize("params", [
+    "",
+    "23.5,1,25,255",
+    "23.5,1,25,255,1609459200,0,test_id",
+])
+def test_parse_too_few_fields(params):
+    """不足8段时返回空字典"""
+    assert DanmakuParamsParser.parse_params_string(params) == {}